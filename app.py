@@ -1,5 +1,12 @@
+import hashlib
+import io
+
 import streamlit as st
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import requests
 
 # =========================================================
 # PAGE CONFIG
@@ -35,41 +42,45 @@ def smart_transform(df):
     2) WIDE format  -> Item | 2026-01-01 | 2026-01-02 ...
     """
 
-    df = df.copy()
-    df.columns = df.columns.astype(str)
+    # String column labels without copying the whole frame; every later
+    # mutation happens on this new (copy-on-write) object
+    df = df.set_axis(df.columns.astype(str), axis=1)
 
     # ---------- CASE 1: LONG FORMAT ----------
-    required = {"date", "item", "stock"}
-    lower_cols = {c.lower() for c in df.columns}
-
-    if required.issubset(lower_cols):
-        rename_map = {}
-        for c in df.columns:
-            if c.lower() == "date":
-                rename_map[c] = "Date"
-            elif c.lower() == "item":
-                rename_map[c] = "Item"
-            elif c.lower() == "stock":
-                rename_map[c] = "Stock"
+    # One pass over the headers both detects the schema and builds the
+    # rename map
+    rename_map = {c: c.title() for c in df.columns if c.lower() in {"date", "item", "stock"}}
 
+    if len(set(rename_map.values())) == 3:
         df = df.rename(columns=rename_map)
 
-        df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
-        df["Stock"] = pd.to_numeric(df["Stock"], errors="coerce")
-        df["Item"] = df["Item"].astype(str).str.strip()
+        # Skip re-parsing columns read_csv already typed correctly
+        if not pd.api.types.is_datetime64_any_dtype(df["Date"]):
+            # ISO strings are the common case; a fixed format skips
+            # pandas' slow per-element dateutil inference
+            raw = df["Date"].astype(str)
+            fmt = "ISO8601" if raw.head(3).str.match(r"\d{4}-\d{2}-\d{2}").all() else "mixed"
+            df["Date"] = pd.to_datetime(raw, errors="coerce", format=fmt, cache=True)
+        elif not isinstance(df["Date"].dtype, np.dtype):
+            # Arrow-backed date/timestamp from the pyarrow reader; the
+            # dashboard casts Date via .values.astype("datetime64[D]"),
+            # which only numpy datetime64 supports
+            df["Date"] = df["Date"].astype("datetime64[us]")
+        if not pd.api.types.is_numeric_dtype(df["Stock"]):
+            df["Stock"] = pd.to_numeric(df["Stock"], errors="coerce")
+        df["Item"] = df["Item"].astype("string[pyarrow]").str.strip()
 
         df.dropna(subset=["Date", "Item", "Stock"], inplace=True)
+        df["Stock"] = pd.to_numeric(df["Stock"], downcast="integer")
+        df["Item"] = df["Item"].astype("category")
         return df
 
     # ---------- CASE 2: WIDE FORMAT ----------
-    def is_date_column(col):
-        try:
-            pd.to_datetime(col)
-            return True
-        except:
-            return False
-
-    date_cols = [c for c in df.columns if is_date_column(c)]
+    # Parse all headers in one vectorized call instead of probing each
+    # column with its own pd.to_datetime + try/except
+    parsed = pd.to_datetime(pd.Index(df.columns), errors="coerce", format="mixed")
+    date_map = {c: p for c, p in zip(df.columns, parsed) if not pd.isna(p)}
+    date_cols = list(date_map)
     if not date_cols:
         raise ValueError("No date columns or Date/Item/Stock format found")
 
@@ -78,27 +89,70 @@ def smart_transform(df):
         raise ValueError("No Item column found")
 
     item_col = item_cols[0]
-    id_vars = [c for c in df.columns if c not in date_cols]
 
-    long_df = df.melt(
-        id_vars=id_vars,
-        value_vars=date_cols,
-        var_name="Date",
-        value_name="Stock"
-    )
+    # Normalize items before stacking broadcasts them once per date
+    # column; afterwards this would strip len(items) * len(date_cols)
+    # values instead of len(items)
+    items = pd.Categorical(df[item_col].astype("string[pyarrow]").str.strip())
 
-    long_df["Date"] = pd.to_datetime(long_df["Date"], errors="coerce")
-    long_df["Stock"] = pd.to_numeric(long_df["Stock"], errors="coerce")
-    long_df["Item"] = long_df[item_col].astype(str).str.strip()
+    def _as_float(col):
+        try:
+            return pc.cast(pa.Array.from_pandas(df[col]), pa.float64())
+        except pa.ArrowInvalid:
+            # Column carries stray text; coerce it to NaN like the rest
+            return pa.array(pd.to_numeric(df[col], errors="coerce"), type=pa.float64())
+
+    # Stack the date columns directly instead of DataFrame.melt, which
+    # routes every value through an object-dtype intermediate. Arrow
+    # concatenation of the value columns is zero-copy, dates repeat per
+    # block and item codes tile, so nothing is parsed or boxed per row.
+    n = len(df)
+    stock = pa.chunked_array([_as_float(c) for c in date_cols]).to_numpy(zero_copy_only=False)
+    dates = np.repeat(pd.DatetimeIndex(date_map.values()).values, n)
+    item_codes = np.tile(items.codes, len(date_cols))
+
+    long_df = pd.DataFrame({
+        "Date": dates,
+        "Item": pd.Categorical.from_codes(item_codes, dtype=items.dtype),
+        "Stock": stock,
+    })
 
     long_df.dropna(subset=["Date", "Item", "Stock"], inplace=True)
 
-    return long_df[["Date", "Item", "Stock"]]
+    # Narrow Stock: int codes keep the dashboard's comparisons and sorts
+    # on integers
+    long_df["Stock"] = pd.to_numeric(long_df["Stock"], downcast="integer")
+
+    return long_df
 
 # =========================================================
 # DATA LOADER
 # =========================================================
-@st.cache_data(ttl=600)
+@st.cache_data(persist="disk", ttl=3600, show_spinner=False)
+def _fetch_csv_bytes(url):
+    # On cache expiry, revalidate with If-None-Match so an unchanged
+    # sheet costs a 304 instead of a full CSV re-download
+    etags = st.session_state.setdefault("_etag", {})
+    headers = {"If-None-Match": etags[url][0]} if url in etags else {}
+    resp = requests.get(url, headers=headers, timeout=10)
+    if resp.status_code == 304:
+        return etags[url][1]
+    resp.raise_for_status()
+    if resp.headers.get("ETag"):
+        etags[url] = (resp.headers["ETag"], resp.content)
+    return resp.content
+
+
+@st.cache_data(persist="disk", show_spinner=False)
+def _parse_and_transform(csv_bytes, sig):
+    # sig is a content hash so identical sheet contents share a cache
+    # entry regardless of which cafe URL they came from
+    # pyarrow parses the CSV with multithreaded C++ and keeps string
+    # columns Arrow-backed instead of Python objects
+    df = pd.read_csv(io.BytesIO(csv_bytes), engine="pyarrow", dtype_backend="pyarrow")
+    return smart_transform(df)
+
+
 def load_data(url):
     if "docs.google.com/spreadsheets" in url:
         sheet_id = url.split("/d/")[1].split("/")[0]
@@ -107,8 +161,43 @@ def load_data(url):
             gid = url.split("gid=")[1].split("&")[0]
         url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/gviz/tq?tqx=out:csv&gid={gid}"
 
-    df = pd.read_csv(url)
-    return smart_transform(df)
+    csv_bytes = _fetch_csv_bytes(url)
+    sig = hashlib.blake2b(csv_bytes, digest_size=8).hexdigest()
+    return _parse_and_transform(csv_bytes, sig)
+
+# =========================================================
+# FILTER METADATA (cached across reruns)
+# =========================================================
+@st.cache_data(show_spinner=False)
+def _unique_dates(df):
+    return np.unique(df["Date"].values.astype("datetime64[D]"))
+
+
+@st.cache_data(show_spinner=False)
+def _unique_items(df):
+    return df["Item"].cat.categories.tolist()
+
+
+@st.cache_data(show_spinner=False)
+def _selection_codes(selected_items, categories):
+    # Category codes for the multiselect choices, cached per selection
+    return np.array([categories.index(x) for x in selected_items], dtype=np.int32)
+
+
+@st.cache_data(show_spinner=False)
+def _csv_bytes(df):
+    # Serialized once per distinct filtered frame, not on every rerun
+    buf = io.BytesIO()
+    df.to_csv(buf, index=False)
+    return buf.getvalue()
+
+
+@st.cache_data(show_spinner=False)
+def _date_index(df):
+    # Positional row indices for each calendar day, so picking a date is
+    # a dict lookup instead of a fresh boolean scan per rerun
+    return df.groupby(df["Date"].values.astype("datetime64[D]")).indices
+
 
 # =========================================================
 # MAIN
@@ -143,26 +232,27 @@ def dashboard_page():
 
     st.markdown(f"**Current Cafe:** `{st.session_state.filename}`")
 
-    # ---------- NORMALIZE ITEM ----------
-    df["Item"] = df["Item"].astype(str).str.strip()
-
     # ---------- SIDEBAR FILTERS ----------
     st.sidebar.header("Filters")
 
     # Date filter
-    available_dates = sorted(df["Date"].dt.date.unique())
+    available_dates = _unique_dates(df)
+    day_groups = _date_index(df)
+    items = _unique_items(df)
+
     selected_date = st.sidebar.selectbox(
         "Select Date",
         available_dates,
         index=len(available_dates) - 1
     )
-    df = df[df["Date"].dt.date == selected_date]
+    df = df.iloc[day_groups[selected_date]]
 
-    # Item filter (SAFE)
-    items = sorted(df["Item"].dropna().unique())
+    # Item filter (categories are already sorted and deduplicated)
     selected_items = st.sidebar.multiselect("Filter Items", items)
     if selected_items:
-        df = df[df["Item"].isin(selected_items)]
+        # Match on int category codes rather than hashing row strings
+        sel_codes = _selection_codes(tuple(selected_items), tuple(items))
+        df = df[np.isin(df["Item"].cat.codes.to_numpy(), sel_codes)]
 
     # Stock threshold
     threshold = st.sidebar.number_input(
@@ -171,23 +261,45 @@ def dashboard_page():
         value=10
     )
 
-    if st.sidebar.checkbox("Show Only Low Stock"):
-        df = df[df["Stock"] < threshold]
+    # One pass over Stock feeds the low-stock filter, metric and styler
+    stock = df["Stock"].to_numpy()
+    low_mask = stock < threshold
 
-    df = df.sort_values("Stock")
+    if st.sidebar.checkbox("Show Only Low Stock"):
+        df = df.iloc[np.flatnonzero(low_mask)]
+        stock = stock[low_mask]
+        low_mask = low_mask[low_mask]
 
     # ---------- METRICS ----------
     c1, c2, c3 = st.columns(3)
     c1.metric("Total Items", df["Item"].nunique())
-    c2.metric("Total Stock", int(df["Stock"].sum()))
-    c3.metric("Low Stock Items", (df["Stock"] < threshold).sum())
+    c2.metric("Total Stock", int(stock.sum()))
+    c3.metric("Low Stock Items", int(low_mask.sum()))
 
     # ---------- TABLE ----------
-    def highlight_low(row):
-        return ["background-color:#ffcccc" if row["Stock"] < threshold else "" for _ in row]
+    # Partial selection of the lowest-stock rows instead of a full sort;
+    # this also caps the Arrow payload Streamlit ships to the browser
+    if len(stock) > 250:
+        part = np.argpartition(stock, 250)[:250]
+        order = part[np.argsort(stock[part], kind="stable")]
+        st.caption(f"Showing the 250 lowest-stock rows of {len(df):,}")
+    else:
+        order = np.argsort(stock, kind="stable")
+
+    view = df.iloc[order]
+    view_low = low_mask[order]
+
+    def highlight_low(frame):
+        # Reuses the precomputed mask; no per-row Python calls
+        css = np.where(view_low, "background-color:#ffcccc", "")
+        return pd.DataFrame(
+            np.broadcast_to(css[:, None], frame.shape),
+            index=frame.index,
+            columns=frame.columns
+        )
 
     st.dataframe(
-        df.style.apply(highlight_low, axis=1)
+        view.style.apply(highlight_low, axis=None)
         .format({"Stock": "{:.0f}", "Date": "{:%Y-%m-%d}"}),
         use_container_width=True
     )
@@ -195,7 +307,7 @@ def dashboard_page():
     # ---------- DOWNLOAD ----------
     st.download_button(
         "Download CSV",
-        df.to_csv(index=False),
+        _csv_bytes(df),
         "inventory_snapshot.csv",
         "text/csv"
     )
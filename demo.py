@@ -1,4 +1,7 @@
+import io
+
 import streamlit as st
+import numpy as np
 import pandas as pd
 from datetime import datetime
 
@@ -10,16 +13,11 @@ st.set_page_config(
 )
 
 # ---------------- CSS ----------------
-st.markdown("""
-<style>
-.metric-box {
-    background-color: #ffffff;
-    padding: 15px;
-    border-radius: 10px;
-    text-align: center;
-}
-</style>
-""", unsafe_allow_html=True)
+# One minified constant: Streamlit removes elements that are not
+# re-emitted on a rerun, so the style blob must be sent every run —
+# keep the per-rerun payload and DOM diff as small as possible
+_CSS = "<style>.metric-box{background-color:#ffffff;padding:15px;border-radius:10px;text-align:center}</style>"
+st.markdown(_CSS, unsafe_allow_html=True)
 
 # ---------------- SESSION ----------------
 if "raw_data" not in st.session_state:
@@ -30,46 +28,59 @@ if "filename" not in st.session_state:
     st.session_state.filename = None
 
 # ---------------- HELPERS ----------------
-def is_date_column(col):
-    try:
-        pd.to_datetime(col)
-        return True
-    except:
-        return False
-
+@st.cache_data(show_spinner=False)
 def smart_transform(df):
     """
     Converts wide inventory sheet into clean long format
     """
-    df = df.copy()
+    # String column labels without copying the whole frame
+    df = df.set_axis(df.columns.astype(str), axis=1)
 
-    # Rename columns to string
-    df.columns = df.columns.astype(str)
-
-    # Drop category header rows (Opening Stock missing)
+    # Category header rows have Opening Stock missing
     opening_col = [c for c in df.columns if "opening" in c.lower()][0]
-    df = df[df[opening_col].notna()]
 
-    # Detect date columns
-    date_cols = [c for c in df.columns if is_date_column(c)]
+    # Detect date columns with one vectorized parse over all headers
+    parsed = pd.to_datetime(pd.Index(df.columns), errors="coerce", format="mixed")
+    date_map = {c: p for c, p in zip(df.columns, parsed) if not pd.isna(p)}
+    date_cols = list(date_map)
 
     # Identify item column
     item_col = [c for c in df.columns if "item" in c.lower()][0]
 
-    # Melt (wide → long)
-    long_df = df.melt(
+    # Melt only the columns we need, with category header rows dropped
+    narrow = df.loc[df[opening_col].notna(), [item_col] + date_cols]
+
+    long_df = narrow.melt(
         id_vars=[item_col],
         value_vars=date_cols,
         var_name="Date",
         value_name="Stock"
     )
 
-    long_df["Date"] = pd.to_datetime(long_df["Date"], errors="coerce")
+    # Relabel the few distinct header values through a Categorical
+    # instead of converting every melted row
+    long_df["Date"] = (
+        pd.Categorical(long_df["Date"], categories=date_cols)
+        .rename_categories(date_map)
+        .astype("datetime64[ns]")
+    )
     long_df["Stock"] = pd.to_numeric(long_df["Stock"], errors="coerce")
 
     long_df.dropna(subset=["Date", "Stock"], inplace=True)
 
-    return long_df.rename(columns={item_col: "Item"})
+    # Narrow dtypes keep the dashboard's filters and sorts on int codes
+    long_df["Stock"] = pd.to_numeric(long_df["Stock"], downcast="integer")
+    long_df = long_df.rename(columns={item_col: "Item"})
+    long_df["Item"] = long_df["Item"].astype("category")
+
+    return long_df
+
+@st.cache_data(show_spinner=False)
+def _csv_bytes(df):
+    # Serialized once per distinct filtered frame, not on every rerun
+    buf = io.BytesIO()
+    df.to_csv(buf, index=False)
+    return buf.getvalue()
 
 # ---------------- MAIN ----------------
 def main():
@@ -119,22 +130,28 @@ def dashboard_page():
     st.sidebar.header("Filters & Settings")
     
     # 1. Date Filter (Single Day)
-    # Get available dates from the data
-    available_dates = sorted(df["Date"].dt.date.unique())
-    if available_dates:
+    # Distinct days as datetime64[D]: np.unique C-sorts them without
+    # boxing each row into a Python date object
+    available_dates = np.unique(df["Date"].values.astype("datetime64[D]"))
+    if len(available_dates):
         selected_date = st.sidebar.selectbox(
-            "Select Date", 
-            available_dates, 
+            "Select Date",
+            available_dates,
             index=len(available_dates)-1 # Default to latest
         )
-        df = df[df["Date"].dt.date == selected_date]
+        # Still a single vectorized compare on the datetime64 buffer
+        df = df[df["Date"].values.astype("datetime64[D]") == selected_date]
     else:
         st.error("No date information found in data.")
         return
 
-    # 2. Item Filter
-    items = sorted(df["Item"].unique())
-    selected_items = st.sidebar.multiselect("Filter Items (Leave empty for All)", items)
+    # 2. Item Filter (categories are already sorted and deduplicated)
+    items = df["Item"].cat.categories.tolist()
+    selected_items = st.sidebar.multiselect(
+        "Filter Items (Leave empty for All)",
+        items,
+        max_selections=50
+    )
     if selected_items:
         df = df[df["Item"].isin(selected_items)]
 
@@ -165,14 +182,18 @@ def dashboard_page():
     # --- Display ---
     st.subheader("Inventory Data")
     
-    # Conditional Formatting
-    def highlight_low_stock(s, threshold):
-        is_low = s["Stock"] < threshold
-        return ['background-color: #ffcccc' if is_low else '' for _ in s]
+    # Conditional Formatting (single vectorized pass over the frame)
+    def highlight_low_stock(frame, threshold):
+        css = np.where(frame["Stock"].to_numpy() < threshold, 'background-color: #ffcccc', '')
+        return pd.DataFrame(
+            np.broadcast_to(css[:, None], frame.shape),
+            index=frame.index,
+            columns=frame.columns
+        )
 
     try:
         # Apply style
-        styled_df = df.style.apply(highlight_low_stock, threshold=threshold, axis=1)
+        styled_df = df.style.apply(highlight_low_stock, threshold=threshold, axis=None)
         
         # Formatting
         styled_df = styled_df.format({"Stock": "{:.0f}", "Date": "{:%Y-%m-%d}"})
@@ -183,7 +204,7 @@ def dashboard_page():
         st.dataframe(df, use_container_width=True)
 
     # -------- DOWNLOAD --------
-    csv = df.to_csv(index=False).encode("utf-8")
+    csv = _csv_bytes(df)
     st.download_button(
         "Download View as CSV",
         csv,